@@ -2,8 +2,17 @@ from temporalio import activity
 from google import genai
 from google.genai import types
 from typing import TypedDict, Any
+from collections import OrderedDict
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
 
 # Temporal best practice: Create a data structure to hold the request parameters.
+# The workflow sends it as an already encoded JSON payload (see encode_gemini_request in
+# workflows/agent.py), which the activity decodes into this shape as usual.
 class GeminiResponsesRequest(TypedDict):
     model: str
     instructions: str
@@ -11,62 +20,171 @@ class GeminiResponsesRequest(TypedDict):
     prompt: str
     tools: list[Any]
 
-def serialize_response(response: Any) -> dict[str, Any]:
+# The worker process is long-lived, so the Gemini client is created once and shared
+# by every activity invocation instead of paying the client setup on each LLM call.
+_client: genai.Client | None = None
+
+def _get_client() -> genai.Client:
     """
-    Convert Gemini API response to serializable format.
-    Extracts function calls and text from response parts.
+    Return the shared Gemini client, creating it on first use.
+    Activities run on the worker's event loop, so a lazy singleton is sufficient.
     """
-    serialized_parts = []
-    if response.candidates and response.candidates[0].content.parts:
-        for part in response.candidates[0].content.parts:
-            part_dict = {}
-            if hasattr(part, 'function_call') and part.function_call:
-                part_dict["function_call"] = {
-                    "name": part.function_call.name,
-                    "args": dict(part.function_call.args)
-                }
-            elif hasattr(part, 'text') and part.text:
-                part_dict["text"] = part.text
-            serialized_parts.append(part_dict)
-
-    return {"parts": serialized_parts}
+    global _client
+    if _client is None:
+        # Automatically picks up GOOGLE_API_KEY from environment
+        _client = genai.Client()
+    return _client
 
-@activity.defn
-async def create(request: GeminiResponsesRequest) -> dict[str, Any]:
+@functools.lru_cache(maxsize=16)
+def _build_config(instructions: str, tools_key: str) -> types.GenerateContentConfig:
     """
-    Invoke Gemini API with pre-built conversation history and tools.
-    Returns the raw response from generate_content() in serializable format.
+    Build (and cache) the config with system instructions and tools.
+    The tools arrive freshly deserialized on every activity call, so they are keyed
+    by their canonical JSON rather than by object identity.
     """
-    # Create Gemini client (automatically picks up GOOGLE_API_KEY from environment)
-    client = genai.Client()
+    return types.GenerateContentConfig(
+        system_instruction=instructions,
+        tools=json.loads(tools_key)
+    )
+
+# Optional in-process cache of Gemini responses, enabled with GEMINI_AGENT_CACHE=1.
+# Identical requests (same model, instructions, history, prompt and tools) are answered
+# from memory instead of calling the Gemini API again, and identical requests that arrive
+# concurrently from different workflows share one in-flight call.
+_RESPONSE_CACHE_ENABLED = os.environ.get("GEMINI_AGENT_CACHE") == "1"
+_RESPONSE_CACHE_MAXSIZE = 256
+_response_cache: OrderedDict[bytes, dict[str, Any]] = OrderedDict()
+_in_flight: dict[bytes, asyncio.Future[dict[str, Any]]] = {}
 
-    # print(f"Create: request is {request}")
+logger = logging.getLogger(__name__)
 
-    # Create config with system instructions and tools
-    config = types.GenerateContentConfig(
-        system_instruction=request["instructions"],
-        tools=request["tools"]
+def _response_cache_key(request: GeminiResponsesRequest, tools_key: str) -> bytes:
+    """Stable hash of everything that determines the Gemini response."""
+    payload = json.dumps(
+        [request["model"], request["instructions"], request["history"], request["prompt"], tools_key],
+        sort_keys=True,
+        separators=(",", ":"),
     )
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+def _response_cache_get(key: bytes) -> dict[str, Any] | None:
+    response = _response_cache.get(key)
+    if response is not None:
+        _response_cache.move_to_end(key)
+    return response
+
+def _response_cache_put(key: bytes, response: dict[str, Any]) -> None:
+    _response_cache[key] = response
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > _RESPONSE_CACHE_MAXSIZE:
+        _response_cache.popitem(last=False)
 
-    # Build contents list from history + current prompt
-    contents = []
+def _function_call_args(args: Any) -> dict[str, Any]:
+    """Function call args as a dict, copying only when the SDK did not already give us one."""
+    if isinstance(args, dict):
+        return args
+    return dict(args) if args else {}
+
+def _tools_key(tools: list[Any]) -> str:
+    """Canonical JSON of the tools, used as the cache key for the config."""
+    return json.dumps(tools, sort_keys=True)
+
+def prepare_config(instructions: str, tools: list[Any]) -> types.GenerateContentConfig:
+    """
+    Build the config for the given instructions and tools ahead of time.
+    The worker calls this at startup so the first LLM call does not pay for it.
+    """
+    return _build_config(instructions, _tools_key(tools))
+
+def serialize_response(response: types.GenerateContentResponse) -> dict[str, list[dict[str, Any]]]:
+    """
+    Convert a Gemini API response (or streamed chunk) to serializable format.
+    Extracts function calls and text from response parts.
+    """
+    candidates = response.candidates
+    if not candidates or not candidates[0].content or not candidates[0].content.parts:
+        return {"parts": []}
+    parts = candidates[0].content.parts
 
-    # Add all history items
-    for history_item in request["history"]:
-        contents.append(history_item)
+    return {"parts": [
+        {"function_call": {"name": function_call.name, "args": _function_call_args(function_call.args)}}
+        if (function_call := part.function_call)
+        else ({"text": text} if (text := part.text) else {})
+        for part in parts
+    ]}
 
-    # Add the current prompt as a user message
-    contents.append({
-        "role": "user",
-        "parts": [{"text": request["prompt"]}]
-    })
+async def _generate(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+    """Call the Gemini API for the request and return the serialized response."""
+    client = _get_client()
 
-    # Generate content with full conversation history
-    response = await client.aio.models.generate_content(
+    # Get the config with system instructions and tools
+    config = _build_config(request["instructions"], tools_key)
+
+    # Build contents list from all history items + the current prompt as a user message
+    contents = [*request["history"], {"role": "user", "parts": [{"text": request["prompt"]}]}]
+
+    # Stream the response with full conversation history. The function calls of a turn
+    # may be spread over several chunks, so keep reading while they arrive. Once a later
+    # chunk carries only other parts (trailing text, which the workflow ignores when tools
+    # are called) the calls are complete and the stream is closed early.
+    stream = await client.aio.models.generate_content_stream(
         model=request["model"],
         contents=contents,
         config=config
     )
+    parts: list[dict[str, Any]] = []
+    seen_function_call = False
+    try:
+        async for chunk in stream:
+            chunk_parts = serialize_response(chunk)["parts"]
+            has_function_call = any("function_call" in part for part in chunk_parts)
+            if seen_function_call and chunk_parts and not has_function_call:
+                break
+            parts.extend(chunk_parts)
+            seen_function_call = seen_function_call or has_function_call
+    finally:
+        await stream.aclose()
+
+    return {"parts": parts}
+
+def _in_flight_done(cache_key: bytes, task: asyncio.Future[dict[str, Any]]) -> None:
+    """
+    Forget a finished shared call. Its exception is retrieved here so that asyncio does
+    not warn about it when every activity waiting on the call was cancelled.
+    """
+    _in_flight.pop(cache_key, None)
+    if not task.cancelled() and (err := task.exception()) is not None:
+        logger.debug("Shared Gemini call failed: %r", err)
+
+async def _generate_and_cache(cache_key: bytes, request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+    serialized = await _generate(request, tools_key)
+    _response_cache_put(cache_key, serialized)
+    return serialized
+
+@activity.defn
+async def create(request: GeminiResponsesRequest) -> dict[str, Any]:
+    """
+    Invoke Gemini API with pre-built conversation history and tools.
+    Returns the raw response from generate_content_stream() in serializable format.
+    """
+    activity.logger.debug("Create request model=%s history_len=%d", request["model"], len(request["history"]))
+
+    tools_key = _tools_key(request["tools"])
+
+    if not _RESPONSE_CACHE_ENABLED:
+        return await _generate(request, tools_key)
+
+    # Answer identical requests from the response cache
+    cache_key = _response_cache_key(request, tools_key)
+    cached = _response_cache_get(cache_key)
+    if cached is not None:
+        return cached
 
-    # Serialize and return response
-    return serialize_response(response)
+    # Concurrent workflows sending an identical request share a single in-flight Gemini call.
+    # The shared call is shielded so that one cancelled activity does not cancel it for the others.
+    task = _in_flight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(_generate_and_cache(cache_key, request, tools_key))
+        _in_flight[cache_key] = task
+        task.add_done_callback(functools.partial(_in_flight_done, cache_key))
+    return await asyncio.shield(task)
@@ -1,46 +1,68 @@
 from temporalio import activity
-from typing import Sequence, Any
+from typing import Sequence, Any, Callable
 from temporalio.common import RawValue
 from temporalio.exceptions import ApplicationError
 from dataclasses import dataclass
 import inspect
+import os
 from pydantic import BaseModel
 
-@dataclass
+# Tool arguments are validated against the tool's Pydantic model by default.
+# Set TRUST_TEMPORAL_PAYLOADS=1 to build the model with model_construct() and skip validation.
+_TRUST_TEMPORAL_PAYLOADS = os.environ.get("TRUST_TEMPORAL_PAYLOADS") == "1"
+
+@dataclass(slots=True)
 class ToolArguments:
     tool_name: str
     args: dict
 
+# Per-tool handler metadata: (Pydantic model of the first parameter or None, is coroutine, takes arguments).
+# Computed with inspect on the first call of each tool and reused afterwards.
+_HANDLER_META: dict[str, tuple[type[BaseModel] | None, bool, bool]] = {}
+
+def _compute_handler_meta(tool_name: str, handler: Callable[..., Any]) -> tuple[type[BaseModel] | None, bool, bool]:
+    params = list(inspect.signature(handler).parameters.values())
+
+    model_cls = None
+    if params:
+        ann = params[0].annotation
+        if isinstance(ann, type) and issubclass(ann, BaseModel):
+            model_cls = ann
+
+    meta = (model_cls, inspect.iscoroutinefunction(handler), len(params) > 0)
+    _HANDLER_META[tool_name] = meta
+    return meta
+
 @activity.defn
 async def invoke_tool(tool_args: ToolArguments) -> Any:
     from gemini_agent.tools import get_handler
 
-    activity.logger.info(f"Running dynamic tool '{tool_args.tool_name}' with args: {tool_args.args}")
+    activity.logger.info("Running dynamic tool '%s' with args: %s", tool_args.tool_name, tool_args.args)
 
     handler = get_handler(tool_args.tool_name)
     if handler is None:
-        activity.logger.info(f"Tool '{tool_args.tool_name}' was not found")
+        activity.logger.info("Tool '%s' was not found", tool_args.tool_name)
         raise ApplicationError(
             type="ToolNotFoundError",
             message=f"Tool '{tool_args.tool_name}' was not found",
             non_retryable=True
         )
 
-    sig = inspect.signature(handler)
-    params = list(sig.parameters.values())
+    model_cls, is_coroutine, takes_args = _HANDLER_META.get(tool_args.tool_name) or _compute_handler_meta(tool_args.tool_name, handler)
 
-    if len(params) == 0:
+    if not takes_args:
         call_args = []
-    else:
-        ann = params[0].annotation
-        if isinstance(tool_args.args, dict) and isinstance(ann, type) and issubclass(ann, BaseModel):
-            call_args = [ann(**tool_args.args)]  # or ann.model_validate(tool_args.args) on Pydantic v2
+    elif model_cls is not None and isinstance(tool_args.args, dict):
+        if _TRUST_TEMPORAL_PAYLOADS:
+            call_args = [model_cls.model_construct(**tool_args.args)]
         else:
-            call_args = [tool_args.args]
+            call_args = [model_cls.model_validate(tool_args.args)]
+    else:
+        call_args = [tool_args.args]
 
-    result = await handler(*call_args) if inspect.iscoroutinefunction(handler) else handler(*call_args)
+    result = await handler(*call_args) if is_coroutine else handler(*call_args)
 
     # Optionally log or augment the result
-    activity.logger.info(f"Tool '{tool_args.tool_name}' result: {result}")
+    activity.logger.info("Tool '%s' result: %s", tool_args.tool_name, result)
     return result
 
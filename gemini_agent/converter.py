@@ -0,0 +1,79 @@
+import dataclasses
+import json
+from typing import Any, Optional, Type
+
+import orjson
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    CompositePayloadConverter,
+    DataConverter,
+    DefaultPayloadConverter,
+    JSONPlainPayloadConverter,
+    value_to_type,
+)
+
+# The agent's payloads (conversation history, tool declarations, Gemini responses) are
+# nested dicts and lists that grow every turn, so encode them with orjson instead of the
+# json module. The payloads keep the "json/plain" encoding, so clients and workers
+# using Temporal's default converter can still read them. The bytes are not identical
+# to the default converter's: orjson writes non-ASCII text as UTF-8 instead of \u
+# escapes, and writes NaN and Infinity as null (the json module writes the non-standard
+# NaN and Infinity tokens). Values orjson cannot encode at all, such as integers wider
+# than 64 bits, are encoded by the default converter instead.
+class OrjsonPlainPayloadConverter(JSONPlainPayloadConverter):
+    """
+    JSON plain payload converter that encodes and decodes with orjson.
+    Takes the same arguments as JSONPlainPayloadConverter: the encoder handles the types
+    orjson does not support natively (e.g. Pydantic models), a custom decoder class
+    switches decoding back to the json module, and custom type converters are applied
+    when converting to type-hinted values.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._fallback_default = self._encoder().default if self._encoder else None
+        self._orjson_options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        if self._fallback_default:
+            # Dataclasses go through the encoder too so that their keys are sorted
+            # like every other object
+            self._orjson_options |= orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def to_payload(self, value: Any) -> Optional[Payload]:
+        try:
+            data = orjson.dumps(
+                value,
+                default=self._fallback_default,
+                option=self._orjson_options,
+            )
+        except orjson.JSONEncodeError:
+            return super().to_payload(value)
+        return Payload(metadata={"encoding": self.encoding.encode()}, data=data)
+
+    def from_payload(self, payload: Payload, type_hint: Optional[Type] = None) -> Any:
+        try:
+            if self._decoder:
+                obj = json.loads(payload.data, cls=self._decoder)
+            else:
+                obj = orjson.loads(payload.data)
+        except (orjson.JSONDecodeError, json.JSONDecodeError) as err:
+            raise RuntimeError("Failed parsing") from err
+        if type_hint:
+            obj = value_to_type(type_hint, obj, self._custom_type_converters)
+        return obj
+
+class OrjsonPayloadConverter(CompositePayloadConverter):
+    """The default payload converters, with JSON handled by orjson."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            *(
+                OrjsonPlainPayloadConverter() if isinstance(converter, JSONPlainPayloadConverter) else converter
+                for converter in DefaultPayloadConverter.default_encoding_payload_converters
+            )
+        )
+
+# Pass this as data_converter to Client.connect() for both the worker and the starter
+orjson_data_converter = dataclasses.replace(
+    DataConverter.default,
+    payload_converter_class=OrjsonPayloadConverter,
+)
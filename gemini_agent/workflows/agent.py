@@ -1,10 +1,14 @@
 from temporalio import workflow
 from datetime import timedelta
-from typing import Any, Union
+from typing import Any, Literal, Union
 from dataclasses import dataclass
 
+import asyncio
 import json
 
+from temporalio.api.common.v1 import Payload
+from temporalio.common import RawValue
+
 from gemini_agent.activities.tool_invoker import invoke_tool, ToolArguments
 
 with workflow.unsafe.imports_passed_through():
@@ -12,34 +16,79 @@ with workflow.unsafe.imports_passed_through():
     from gemini_agent.helpers import tool_helpers
     from gemini_agent.activities import gemini_responses
 
-@dataclass
+# Timeout shared by the LLM and tool activities
+_ACTIVITY_TIMEOUT = timedelta(seconds=30)
+
+@dataclass(slots=True)
 class FunctionCallOutput:
     """Represents a function call in the model's response."""
-    type: str  # Always "function_call"
+    type: Literal["function_call"]
     name: str
     call_id: str
     arguments: dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class MessageOutput:
     """Represents a message in the model's response."""
-    type: str  # Always "message"
+    type: Literal["message"]
     content: str
 
-@dataclass
+@dataclass(slots=True)
 class GeminiResponse:
     """Parsed Gemini response containing output items and text."""
     output: list[Union[FunctionCallOutput, MessageOutput]]
     output_text: str
 
+# After a function response, we need to prompt Gemini to continue
+CONTINUE_PROMPT = "Please continue and provide your response based on the tool results."
+
+def message_history_item(role: str, text: str) -> dict[str, Any]:
+    """A text message in Gemini history format."""
+    return {
+        "role": role,
+        "parts": [{"text": text}]
+    }
+
+def function_call_history_item(function_calls: list[tuple[str, dict[str, Any]]]) -> dict[str, Any]:
+    """
+    The model's tool calls for one turn in Gemini history format: a single model
+    content with one function_call part per (name, arguments) call, in order.
+    """
+    return {
+        "role": "model",
+        "parts": [{
+            "function_call": {
+                "name": name,
+                "args": arguments
+            }
+        } for name, arguments in function_calls]
+    }
+
+def function_response_history_item(function_responses: list[tuple[str, Any]]) -> dict[str, Any]:
+    """
+    The tool responses for one turn in Gemini history format: a single user content
+    with one function_response part per (call_id, output) response, in the same order
+    as the calls.
+    """
+    return {
+        "role": "user",
+        "parts": [{
+            "function_response": {
+                "name": call_id,
+                "response": {"result": output}
+            }
+        } for call_id, output in function_responses]
+    }
+
 def build_history_from_input(input_list: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], str]:
     """
     Convert input list to Gemini's expected history format.
     Returns a tuple of (history, prompt) where:
     - history: list of conversation history items in Gemini format
     - prompt: the prompt to send to the model
+    The workflow uses this to seed the history; later turns are appended to it directly.
     """
-    history = []
+    history: list[dict[str, Any]] = []
 
     # Check if the last item is a function_call_output - if so, include it in history
     last_item = input_list[-1]
@@ -51,68 +100,106 @@ def build_history_from_input(input_list: list[dict[str, Any]]) -> tuple[list[dic
 
     for item in items_for_history:
         if item.get("type") == "message":
-            history.append({
-                "role": item["role"],
-                "parts": [{"text": item["content"]}]
-            })
+            history.append(message_history_item(item["role"], item["content"]))
         elif item.get("type") == "function_call":
-            # Model's tool call
-            history.append({
-                "role": "model",
-                "parts": [{
-                    "function_call": {
-                        "name": item["name"],
-                        "args": dict(item["arguments"])
-                    }
-                }]
-            })
+            history.append(function_call_history_item([(item["name"], item["arguments"])]))
         elif item.get("type") == "function_call_output":
-            # Tool response (sent as user role with function_response part)
-            history.append({
-                "role": "user",
-                "parts": [{
-                    "function_response": {
-                        "name": item["call_id"],
-                        "response": {"result": item["output"]}
-                    }
-                }]
-            })
+            history.append(function_response_history_item([(item["call_id"], item["output"])]))
 
     # Determine the prompt to send
+    prompt: str
     if is_continuing_after_tool:
-        # After a function response, we need to prompt Gemini to continue
-        prompt = "Please continue and provide your response based on the tool results."
+        prompt = CONTINUE_PROMPT
     else:
         prompt = last_item.get("content", "")
 
     return history, prompt
 
+def encode_json(value: Any) -> bytes:
+    """
+    Encode a value (a dict, list or str here) as JSON with the workflow's payload converter.
+    encode_gemini_request splices these bytes into a json/plain payload, so any other
+    encoding from the configured converter is an error rather than a corrupt request.
+    """
+    payload = workflow.payload_converter().to_payload(value)
+    encoding = payload.metadata.get("encoding")
+    if encoding != b"json/plain":
+        raise ValueError(f"Expected the payload converter to encode {type(value).__name__} as json/plain, got {encoding!r}")
+    return payload.data
+
+def encode_gemini_request(static_fields: dict[str, bytes], history_parts: list[bytes], prompt: str) -> RawValue:
+    """
+    Assemble a GeminiResponsesRequest payload from already encoded pieces.
+    - static_fields: the encoded model, instructions and tools, keyed by field name
+    - history_parts: each history item encoded once, when it was added to the conversation
+    The activity receives the same JSON object it would get from encoding the request
+    as a whole, but the history is not re-encoded on every turn.
+    """
+    fields = {
+        **static_fields,
+        "history": b"[" + b",".join(history_parts) + b"]",
+        "prompt": encode_json(prompt),
+    }
+    # The field names are spelled out here rather than taken from a GeminiResponsesRequest
+    # instance, so check them against the TypedDict the activity decodes into
+    if fields.keys() != gemini_responses.GeminiResponsesRequest.__annotations__.keys():
+        raise ValueError(f"Request fields {sorted(fields)} do not match GeminiResponsesRequest")
+    data = b"{" + b",".join(encode_json(name) + b":" + value for name, value in fields.items()) + b"}"
+    return RawValue(Payload(metadata={"encoding": b"json/plain"}, data=data))
+
 def parse_gemini_response(raw_response: dict[str, Any]) -> GeminiResponse:
     """
     Parse the raw Gemini response and convert to output structure.
     Returns a GeminiResponse dataclass with 'output' (list of items) and 'output_text' (str).
     """
-    output: list[Union[FunctionCallOutput, MessageOutput]] = []
-    output_text = ""
+    parts = raw_response.get("parts", ())
+
+    # Fast path for the common shape: a single function call or a single text part
+    if len(parts) == 1:
+        part = parts[0]
+        function_call = part.get("function_call")
+        if function_call is not None:
+            name = function_call["name"]
+            return GeminiResponse(
+                output=[FunctionCallOutput(
+                    type="function_call",
+                    name=name,
+                    call_id=name,  # Use name as call_id
+                    arguments=function_call["args"]
+                )],
+                output_text=""
+            )
+        output_text = part.get("text", "")
+        return GeminiResponse(
+            output=[MessageOutput(type="message", content=output_text)],
+            output_text=output_text
+        )
 
-    parts = raw_response.get("parts", [])
+    output: list[Union[FunctionCallOutput, MessageOutput]] = []
+    append = output.append
+    text_parts: list[str] = []
+    has_function_call = False
 
     for part in parts:
-        if "function_call" in part:
+        function_call = part.get("function_call")
+        if function_call is not None:
             # Tool call detected
-            function_call = part["function_call"]
-            output.append(FunctionCallOutput(
+            name = function_call["name"]
+            append(FunctionCallOutput(
                 type="function_call",
-                name=function_call["name"],
-                call_id=function_call["name"],  # Use name as call_id
+                name=name,
+                call_id=name,  # Use name as call_id
                 arguments=function_call["args"]
             ))
+            has_function_call = True
         elif "text" in part:
             # Text response
-            output_text += part["text"]
+            text_parts.append(part["text"])
+
+    output_text = "".join(text_parts)
 
     # If no tool calls, add text as message output
-    if not any(isinstance(item, FunctionCallOutput) for item in output):
+    if not has_function_call:
         output.append(MessageOutput(
             type="message",
             content=output_text
@@ -125,77 +212,90 @@ class AgentGeminiWorkflow:
     @workflow.run
     async def run(self, input: str) -> str:
 
-        input_list = [{"type": "message", "role": "user", "content": input}]
+        # Seed the history and prompt from the user's input. Each turn after that is
+        # appended to the history directly instead of rebuilding it from scratch.
+        history, prompt = build_history_from_input([{"type": "message", "role": "user", "content": input}])
+        continuing_after_tool = False
+
+        # The history grows every turn, so each item is encoded once when it is added
+        # and the request payload is assembled from the encoded pieces.
+        history_parts = [encode_json(history_item) for history_item in history]
+
+        # The model, tools and system instructions do not change during the loop, so build
+        # and encode them once
+        static_fields = {
+            name: encode_json(value)
+            for name, value in {
+                "model": "gemini-3-flash-preview",
+                "instructions": tool_helpers.HELPFUL_AGENT_SYSTEM_INSTRUCTIONS,
+                "tools": get_tools(),
+            }.items()
+        }
 
         # The agentic loop
         while True:
 
-            print(80 * "=")
-
-            # Build history and prompt from input list
-            history, prompt = build_history_from_input(input_list)
+            workflow.logger.debug("Consulting the LLM with %d history items", len(history_parts))
 
-            # consult the LLM
+            # consult the LLM. The request is passed as a RawValue holding the already encoded
+            # GeminiResponsesRequest JSON; Temporal sends it unchanged and the activity decodes
+            # it as a GeminiResponsesRequest, although type checkers flag the argument type.
             raw_response = await workflow.execute_activity(
                 gemini_responses.create,
-                gemini_responses.GeminiResponsesRequest(
-                    model="gemini-3-flash-preview",
-                    instructions=tool_helpers.HELPFUL_AGENT_SYSTEM_INSTRUCTIONS,
-                    history=history,
-                    prompt=prompt,
-                    tools=get_tools(),
-                ),
-                start_to_close_timeout=timedelta(seconds=30),
+                encode_gemini_request(static_fields, history_parts, prompt),  # type: ignore[misc]
+                start_to_close_timeout=_ACTIVITY_TIMEOUT,
             )
 
-            # print("---- raw response ---- ")
-            # print(f"{raw_response}")
-            # print("--- end raw response ---")
+            workflow.logger.debug("Raw response: %s", raw_response)
 
             # Parse the raw response
             result = parse_gemini_response(raw_response)
 
-            # For this simple example, we only have one item in the output list
-            # Either the LLM will have chosen a single function call or it will
-            # have chosen to respond with a message.
-            item = result.output[0]
+            # The LLM either chose one or more function calls or it chose to
+            # respond with a message.
+            function_calls = [item for item in result.output if item.type == "function_call"]
 
-            # Now process the LLM output to either call a tool or respond with a message.
+            # Now process the LLM output to either call the tools or respond with a message.
 
-            # if the result is a tool call, call the tool
-            if isinstance(item, FunctionCallOutput):
-                tool_result = await self._handle_function_call(item, result, input_list)
+            # if the result contains tool calls, call all of the tools concurrently
+            if function_calls:
+                tool_handles = [self._handle_function_call(item) for item in function_calls]
+                tool_results = await asyncio.gather(*tool_handles)
 
-                # add the tool call result to the input list for context
-                input_list.append({"type": "function_call_output",
-                                    "call_id": item.call_id,
-                                    "output": tool_result})
+                # the user prompt that led to the tool calls is now part of the conversation;
+                # the continuation prompt is never recorded
+                if not continuing_after_tool:
+                    history_parts.append(encode_json(message_history_item("user", prompt)))
+
+                # add the tool calls and their results to the history for context: one model
+                # turn with all of the calls (the decision the LLM made to call the tools),
+                # then one user turn with all of the results in the order the LLM requested them
+                history_parts.append(encode_json(function_call_history_item(
+                    [(item.name, item.arguments) for item in function_calls]
+                )))
+                history_parts.append(encode_json(function_response_history_item(
+                    [(item.call_id, tool_result) for item, tool_result in zip(function_calls, tool_results)]
+                )))
+
+                prompt = CONTINUE_PROMPT
+                continuing_after_tool = True
 
             # if the result is not a tool call we will just respond with a message
             else:
-                print(f"No tools chosen, responding with a message: {result.output_text}")
+                workflow.logger.debug("No tools chosen, responding with a message: %s", result.output_text)
                 return result.output_text
 
 
-    async def _handle_function_call(self, item: FunctionCallOutput, result: GeminiResponse, input_list):
-        # serialize the LLM output - the decision the LLM made to call a tool
-        input_list.append({
-            "type": "function_call",
-            "name": item.name,
-            "call_id": item.call_id,
-            "arguments": item.arguments
-        })
-
-        # execute activity with the tool name and arguments
+    def _handle_function_call(self, item: FunctionCallOutput) -> workflow.ActivityHandle[Any]:
+        # start the activity with the tool name and arguments. Temporal sends the schedule
+        # commands for all of the turn's tools together when the workflow next yields.
         tool_args = ToolArguments(item.name, item.arguments)
 
-        tool_result = await workflow.execute_activity(
+        workflow.logger.debug("Making a tool call to %s", item.name)
+
+        return workflow.start_activity(
             invoke_tool,
             tool_args,
-            start_to_close_timeout=timedelta(seconds=30),
+            start_to_close_timeout=_ACTIVITY_TIMEOUT,
             summary=item.name,
         )
-
-        print(f"Made a tool call to {item.name}")
-
-        return tool_result
@@ -5,11 +5,13 @@ import uuid
 from temporalio.client import Client
 
 from gemini_agent.workflows.agent import AgentGeminiWorkflow
+from gemini_agent.converter import orjson_data_converter
 
 
 async def main():
     client = await Client.connect(
         "localhost:7233",
+        data_converter=orjson_data_converter,
     )
 
     query = sys.argv[1] if len(sys.argv) > 1 else "Tell me about recursion"
@@ -0,0 +1,45 @@
+import pytest
+from temporalio import workflow
+
+from gemini_agent.activities.gemini_responses import GeminiResponsesRequest
+from gemini_agent.converter import orjson_data_converter
+from gemini_agent.workflows.agent import (
+    encode_gemini_request,
+    encode_json,
+    message_history_item,
+)
+
+
+@pytest.fixture(autouse=True)
+def payload_converter(monkeypatch):
+    converter = orjson_data_converter.payload_converter
+    monkeypatch.setattr(workflow, "payload_converter", lambda: converter)
+    return converter
+
+
+def test_encode_gemini_request_decodes_as_request(payload_converter):
+    history = [message_history_item("user", "héllo"), message_history_item("model", "hi")]
+    static_fields = {
+        "model": encode_json("gemini-3-flash-preview"),
+        "instructions": encode_json("be helpful"),
+        "tools": encode_json([{"name": "get_ip_address"}]),
+    }
+
+    raw = encode_gemini_request(static_fields, [encode_json(item) for item in history], "what now?")
+    request = payload_converter.from_payload(raw.payload, GeminiResponsesRequest)
+
+    assert request.keys() == GeminiResponsesRequest.__annotations__.keys()
+    assert request == {
+        "model": "gemini-3-flash-preview",
+        "instructions": "be helpful",
+        "history": history,
+        "prompt": "what now?",
+        "tools": [{"name": "get_ip_address"}],
+    }
+
+
+def test_encode_gemini_request_rejects_unknown_fields():
+    static_fields = {"model": encode_json("gemini-3-flash-preview"), "temperature": encode_json(0.5)}
+
+    with pytest.raises(ValueError):
+        encode_gemini_request(static_fields, [], "what now?")
@@ -0,0 +1,50 @@
+from typing import Any
+
+from temporalio.converter import DataConverter
+
+from gemini_agent.activities.tool_invoker import ToolArguments
+from gemini_agent.converter import orjson_data_converter
+
+
+def test_orjson_data_converter_round_trip():
+    converter = orjson_data_converter.payload_converter
+    history: list[dict[str, Any]] = [
+        {"role": "user", "parts": [{"text": "héllo, are there any weather alerts for where I am?"}]},
+        {"role": "model", "parts": [
+            {"function_call": {"name": "get_ip_address", "args": {}}},
+            {"function_call": {"name": "get_weather_alerts", "args": {"state": "CA", "limit": 2.0}}},
+        ]},
+        {"role": "user", "parts": [
+            {"function_response": {"name": "get_ip_address", "response": {"result": "19.199.198.200"}}},
+            {"function_response": {"name": "get_weather_alerts", "response": {"result": None}}},
+        ]},
+    ]
+    tool_args = ToolArguments("get_weather_alerts", {"state": "CA"})
+
+    payloads = converter.to_payloads([tool_args, history])
+
+    assert [payload.metadata["encoding"] for payload in payloads] == [b"json/plain", b"json/plain"]
+    assert converter.from_payloads(payloads, [ToolArguments, list[dict[str, Any]]]) == [tool_args, history]
+    # Temporal's default JSON converter decodes the same values, so either side can read them
+    default_converter = DataConverter.default.payload_converter
+    assert default_converter.from_payloads(payloads, [ToolArguments, list[dict[str, Any]]]) == [tool_args, history]
+
+
+def test_orjson_data_converter_falls_back_for_wide_ints():
+    converter = orjson_data_converter.payload_converter
+    value = {"big": 2**64, "small": 1}
+
+    payload = converter.to_payloads([value])[0]
+
+    # orjson cannot encode integers wider than 64 bits, so the default converter does
+    assert payload == DataConverter.default.payload_converter.to_payloads([value])[0]
+    assert converter.from_payloads([payload])[0] == value
+
+
+def test_orjson_data_converter_encodes_nan_as_null():
+    converter = orjson_data_converter.payload_converter
+
+    payload = converter.to_payloads([{"score": float("nan")}])[0]
+
+    assert payload.data == b'{"score":null}'
+    assert converter.from_payloads([payload])[0] == {"score": None}
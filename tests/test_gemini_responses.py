@@ -0,0 +1,204 @@
+import asyncio
+import gc
+import pytest
+from types import SimpleNamespace
+from typing import Any
+
+from google.genai import types
+
+from temporalio.testing import ActivityEnvironment
+
+from gemini_agent.activities import gemini_responses
+from gemini_agent.activities.gemini_responses import (
+    GeminiResponsesRequest,
+    create,
+)
+
+
+def make_request(prompt: str = "where am I?") -> GeminiResponsesRequest:
+    return GeminiResponsesRequest(
+        model="gemini-mocked",
+        instructions="Be helpful.",
+        history=[],
+        prompt=prompt,
+        tools=[{"function_declarations": []}],
+    )
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    # Enable the response cache with fresh, empty state for each test
+    monkeypatch.setattr(gemini_responses, "_RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(gemini_responses, "_response_cache", type(gemini_responses._response_cache)())
+    monkeypatch.setattr(gemini_responses, "_in_flight", {})
+
+@pytest.mark.asyncio
+async def test_response_cache_hit_skips_generate(monkeypatch, response_cache):
+    calls: list[str] = []
+
+    async def generate_mocked(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+        calls.append(request["prompt"])
+        return {"parts": [{"text": f"answer to {request['prompt']}"}]}
+
+    monkeypatch.setattr(gemini_responses, "_generate", generate_mocked)
+
+    env = ActivityEnvironment()
+    first = await env.run(create, make_request())
+    second = await env.run(create, make_request())
+    other = await env.run(create, make_request("what is my ip address?"))
+
+    assert first == second == {"parts": [{"text": "answer to where am I?"}]}
+    assert other == {"parts": [{"text": "answer to what is my ip address?"}]}
+    assert calls == ["where am I?", "what is my ip address?"]
+
+@pytest.mark.asyncio
+async def test_response_cache_evicts_least_recently_used(monkeypatch, response_cache):
+    calls: list[str] = []
+
+    async def generate_mocked(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+        calls.append(request["prompt"])
+        return {"parts": [{"text": request["prompt"]}]}
+
+    monkeypatch.setattr(gemini_responses, "_generate", generate_mocked)
+    monkeypatch.setattr(gemini_responses, "_RESPONSE_CACHE_MAXSIZE", 2)
+
+    env = ActivityEnvironment()
+    for prompt in ["a", "b", "a", "c", "a", "b"]:
+        await env.run(create, make_request(prompt))
+
+    # "a" stays cached because it was used again; "b" was evicted when "c" arrived
+    assert calls == ["a", "b", "c", "b"]
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_generate(monkeypatch, response_cache):
+    calls: list[str] = []
+    release = asyncio.Event()
+
+    async def generate_mocked(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+        calls.append(request["prompt"])
+        await release.wait()
+        return {"parts": [{"text": "shared"}]}
+
+    monkeypatch.setattr(gemini_responses, "_generate", generate_mocked)
+
+    env = ActivityEnvironment()
+    first = asyncio.ensure_future(env.run(create, make_request()))
+    second = asyncio.ensure_future(env.run(create, make_request()))
+    # Let both activities reach the in-flight lookup while the first call is still running
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert len(gemini_responses._in_flight) == 1
+
+    release.set()
+    assert await first == await second == {"parts": [{"text": "shared"}]}
+    assert calls == ["where am I?"]
+    assert gemini_responses._in_flight == {}
+
+@pytest.mark.asyncio
+async def test_failed_generate_is_not_cached(monkeypatch, response_cache):
+    calls: list[str] = []
+
+    async def generate_mocked(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+        calls.append(request["prompt"])
+        if len(calls) == 1:
+            raise RuntimeError("Gemini unavailable")
+        return {"parts": [{"text": "recovered"}]}
+
+    monkeypatch.setattr(gemini_responses, "_generate", generate_mocked)
+
+    env = ActivityEnvironment()
+    with pytest.raises(RuntimeError, match="Gemini unavailable"):
+        await env.run(create, make_request())
+    assert gemini_responses._in_flight == {}
+    assert len(gemini_responses._response_cache) == 0
+
+    # The retry calls Gemini again instead of reusing the failed call
+    assert await env.run(create, make_request()) == {"parts": [{"text": "recovered"}]}
+    assert calls == ["where am I?", "where am I?"]
+
+@pytest.mark.asyncio
+async def test_failed_shared_call_after_all_waiters_cancelled(monkeypatch, response_cache, caplog):
+    release = asyncio.Event()
+
+    async def generate_mocked(request: GeminiResponsesRequest, tools_key: str) -> dict[str, Any]:
+        await release.wait()
+        raise RuntimeError("Gemini unavailable")
+
+    monkeypatch.setattr(gemini_responses, "_generate", generate_mocked)
+
+    env = ActivityEnvironment()
+    waiter = asyncio.ensure_future(env.run(create, make_request()))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    (shared,) = gemini_responses._in_flight.values()
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    # The shared call keeps running, then fails with nobody left waiting on it
+    release.set()
+    while not shared.done():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)  # let the done callback run
+    assert gemini_responses._in_flight == {}
+    assert len(gemini_responses._response_cache) == 0
+
+    # The done callback retrieved the exception, so asyncio has nothing to report
+    del shared
+    gc.collect()
+    assert "exception was never retrieved" not in caplog.text
+
+def function_call_chunk(name: str, args: dict[str, Any]) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+        role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+    ))])
+
+def text_chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+        role="model", parts=[types.Part(text=text)]
+    ))])
+
+def mock_stream(monkeypatch, chunks: list[types.GenerateContentResponse]) -> list[int]:
+    """Serve the chunks from a mocked Gemini client; returns the indexes of the chunks read."""
+    read: list[int] = []
+
+    async def stream():
+        for index, chunk in enumerate(chunks):
+            read.append(index)
+            yield chunk
+
+    async def generate_content_stream(**kwargs):
+        return stream()
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+    monkeypatch.setattr(gemini_responses, "_get_client", lambda: client)
+    monkeypatch.setattr(gemini_responses, "_RESPONSE_CACHE_ENABLED", False)
+    return read
+
+@pytest.mark.asyncio
+async def test_stream_keeps_function_calls_from_separate_chunks(monkeypatch):
+    read = mock_stream(monkeypatch, [
+        function_call_chunk("get_ip_address", {}),
+        function_call_chunk("get_weather_alerts", {"state": "CA"}),
+        text_chunk("Let me check that."),
+        text_chunk("never read"),
+    ])
+
+    response = await ActivityEnvironment().run(create, make_request())
+
+    assert response["parts"][:2] == [
+        {"function_call": {"name": "get_ip_address", "args": {}}},
+        {"function_call": {"name": "get_weather_alerts", "args": {"state": "CA"}}},
+    ]
+    assert all("function_call" not in part for part in response["parts"][2:])
+    # The stream is closed once text follows the calls
+    assert read == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_stream_reads_all_text_chunks(monkeypatch):
+    read = mock_stream(monkeypatch, [text_chunk("Your IP address\n"), text_chunk("Is 19.199.198.200.\n")])
+
+    response = await ActivityEnvironment().run(create, make_request())
+
+    assert response == {"parts": [{"text": "Your IP address\n"}, {"text": "Is 19.199.198.200.\n"}]}
+    assert read == [0, 1]
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+import uuid
+from typing import Any
+
+from temporalio import activity
+from temporalio.worker import Worker
+from temporalio.testing import WorkflowEnvironment
+
+from gemini_agent.workflows.agent import (
+    AgentGeminiWorkflow,
+)
+
+from gemini_agent.activities.gemini_responses import (
+    GeminiResponsesRequest,
+)
+from gemini_agent.activities.tool_invoker import (
+    ToolArguments,
+)
+
+tool_events: list[tuple[str, str]] = []
+both_tools_started = asyncio.Event()
+final_history: list[dict[str, Any]] = []
+
+
+@activity.defn(name="create")
+async def create_mocked_with_parallel_tool_calls(request: GeminiResponsesRequest) -> dict[str, Any]:
+    # The first turn asks for two tools at once, the second turn answers with text
+    if not request["history"]:
+        return {'parts': [
+            {'function_call': {'name': 'get_ip_address', 'args': {}}},
+            {'function_call': {'name': 'get_weather_alerts', 'args': {'state': 'CA'}}},
+        ]}
+    final_history.extend(request["history"])
+    return {'parts': [{'text': f"Saw {len(request['history'])} history items\n"}]}
+
+@activity.defn(name="invoke_tool")
+async def invoke_tool_mocked(tool_args: ToolArguments) -> Any:
+    tool_events.append(("start", tool_args.tool_name))
+    if [event for event, _ in tool_events].count("start") == 2:
+        both_tools_started.set()
+    # Hold each tool until both are running. If the tools ran one after the other,
+    # the first would give up waiting and finish before the second started.
+    try:
+        await asyncio.wait_for(both_tools_started.wait(), timeout=5)
+    except asyncio.TimeoutError:
+        pass
+    tool_events.append(("finish", tool_args.tool_name))
+    return f"{tool_args.tool_name} result"
+
+@pytest.mark.asyncio
+async def test_mocked_parallel_tool_calls():
+    task_queue_name = str(uuid.uuid4())
+    tool_events.clear()
+    both_tools_started.clear()
+    final_history.clear()
+
+    env = await WorkflowEnvironment.start_time_skipping()
+
+    async with Worker(
+        client=env.client,
+        task_queue=task_queue_name,
+        workflows=[AgentGeminiWorkflow],
+        activities=[create_mocked_with_parallel_tool_calls, invoke_tool_mocked],
+    ):
+        result = await env.client.execute_workflow(
+            AgentGeminiWorkflow.run,
+            "My mocked prompt",
+            id=str(uuid.uuid4()),
+            task_queue=task_queue_name,
+        )
+
+        # user prompt, one model turn with both calls, one user turn with both responses
+        assert result == "Saw 3 history items\n"
+        # both tool activities started before either of them finished
+        assert sorted(tool_events[:2]) == [("start", "get_ip_address"), ("start", "get_weather_alerts")]
+        assert sorted(tool_events[2:]) == [("finish", "get_ip_address"), ("finish", "get_weather_alerts")]
+
+        prompt_turn, call_turn, response_turn = final_history
+        assert prompt_turn == {"role": "user", "parts": [{"text": "My mocked prompt"}]}
+        assert call_turn == {"role": "model", "parts": [
+            {"function_call": {"name": "get_ip_address", "args": {}}},
+            {"function_call": {"name": "get_weather_alerts", "args": {"state": "CA"}}},
+        ]}
+        assert response_turn == {"role": "user", "parts": [
+            {"function_response": {"name": "get_ip_address", "response": {"result": "get_ip_address result"}}},
+            {"function_response": {"name": "get_weather_alerts", "response": {"result": "get_weather_alerts result"}}},
+        ]}
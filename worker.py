@@ -4,7 +4,10 @@ from temporalio.client import Client
 from temporalio.worker import Worker
 
 from gemini_agent.workflows.agent import AgentGeminiWorkflow
+from gemini_agent.converter import orjson_data_converter
 from gemini_agent.activities import gemini_responses, tool_invoker
+from gemini_agent.helpers import tool_helpers
+from gemini_agent.tools import get_tools
 
 from concurrent.futures import ThreadPoolExecutor
 
@@ -12,8 +15,12 @@ from concurrent.futures import ThreadPoolExecutor
 async def main():
     client = await Client.connect(
         "localhost:7233",
+        data_converter=orjson_data_converter,
     )
 
+    # Build the Gemini config for the agent's instructions and tools once, up front
+    gemini_responses.prepare_config(tool_helpers.HELPFUL_AGENT_SYSTEM_INSTRUCTIONS, get_tools())
+
     worker = Worker(
         client,
         task_queue="tool-invoking-agent-gemini-task-queue",